@@ -0,0 +1,244 @@
+"""
+Benchmark suite for the VMS pipeline.
+
+Builds a synthetic network and fleet, times every stage of the pipeline separately
+and writes the results as JSON. With --baseline, the results are compared against a
+previous run and the process exits with code 1 if any stage got slower than the
+allowed tolerance.
+
+Usage:
+    python -m benchmarks.run_benchmarks --shapes 5 --points 500 --buses 20 --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from statistics import mean, median
+from time import perf_counter
+
+from benchmarks.synthetic import build_network, build_fleet, shape_coordinates
+from gps.map_matching import find_closest_projection, find_next_stop, point_to_segment_distance
+
+SAMPLE_FRAMES = ("passengers_1.png", "passengers_2.png")
+
+# Stages with fewer calls than this are reported but not used to flag regressions:
+# a handful of samples is too noisy for a 20% tolerance
+MIN_GATED_CALLS = 10
+
+def _summary(durations):
+    """Statistics (in milliseconds) of a list of durations in seconds."""
+    ordered = sorted(durations)
+    return {
+        "calls": len(ordered),
+        "total_ms": round(sum(ordered) * 1000, 4),
+        "mean_ms": round(mean(ordered) * 1000, 4),
+        "p50_ms": round(median(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+        "ops_per_sec": round(len(ordered) / sum(ordered), 2) if sum(ordered) else None
+    }
+
+def _skipped(reason):
+    print(f"Skipping stage: {reason}")
+    return {"skipped": reason}
+
+def bench_map_matching(shapes_dict, stops_info, fleet, ticks, tick_seconds):
+    """Time projection, next-stop search and remaining distance for every bus on every tick."""
+    coordinates = {shape_id: shape_coordinates(shapes_dict, shape_id) for shape_id in shapes_dict}
+    timings = {"find_closest_projection": [], "next_stop_search": [], "point_to_segment_distance": []}
+
+    for _ in range(ticks):
+        for bus in fleet:
+            bus.advance(tick_seconds)
+            route_coordinates = coordinates[bus.route_id]
+
+            start = perf_counter()
+            closest_point, segment_index = find_closest_projection((bus.latitude, bus.longitude), route_coordinates)
+            timings["find_closest_projection"].append(perf_counter() - start)
+
+            start = perf_counter()
+            next_stop_id, upper_limit_point = find_next_stop(route_coordinates, segment_index, stops_info)
+            timings["next_stop_search"].append(perf_counter() - start)
+
+            start = perf_counter()
+            point_to_segment_distance(route_coordinates, segment_index, closest_point, upper_limit_point)
+            timings["point_to_segment_distance"].append(perf_counter() - start)
+
+    return {stage: _summary(durations) for stage, durations in timings.items()}
+
+def bench_planar_matching(shapes_dict, stops_info, fleet, ticks, tick_seconds):
+    """Same as bench_map_matching using the precomputed metric frame of gps.geometry, plus bulk projection per tick."""
+    try:
+        from gps.geometry import ProjectedShape
+    except ImportError as e:
+        return {"planar_projection": _skipped(f"planar geometry ({e})")}
+
+    coordinates = {shape_id: shape_coordinates(shapes_dict, shape_id) for shape_id in shapes_dict}
+    start = perf_counter()
+    shapes = {shape_id: ProjectedShape(coordinates[shape_id]) for shape_id in shapes_dict}
+    load_time = perf_counter() - start
+    timings = {"planar_projection": [], "planar_remaining_distance": [], "planar_bulk_projection": []}
+
+    for _ in range(ticks):
+        for bus in fleet:
+            bus.advance(tick_seconds)
+            shape = shapes[bus.route_id]
+
+            start = perf_counter()
+            closest_point, segment_index, distance_along = shape.project((bus.latitude, bus.longitude))
+            timings["planar_projection"].append(perf_counter() - start)
+
+            next_stop_id, upper_limit_point = find_next_stop(coordinates[bus.route_id], segment_index, stops_info)
+
+            start = perf_counter()
+            shape.remaining_distance(distance_along, upper_limit_point)
+            timings["planar_remaining_distance"].append(perf_counter() - start)
+
+        # Whole fleet of each shape converted and projected in one call
+        for shape_id, shape in shapes.items():
+            buses = [bus for bus in fleet if bus.route_id == shape_id]
+            start = perf_counter()
+            shape.project_many([bus.latitude for bus in buses], [bus.longitude for bus in buses])
+            timings["planar_bulk_projection"].append(perf_counter() - start)
+
+    results = {stage: _summary(durations) for stage, durations in timings.items()}
+    results["planar_shape_load"] = _summary([load_time])
+    return results
+
+def bench_rendering(repeat):
+    """Time parse_colored_text_fixed + build_led_image for a typical sign."""
+    try:
+        from vms.vms_display import parse_colored_text_fixed, build_led_image
+    except ImportError as e:
+        return _skipped(f"rendering ({e})")
+
+    text = "Ruta 204 >> {0,255,0}120 seg{/color} >> {0,255,255}Medio{/color}"
+    build_led_image(parse_colored_text_fixed(text, font_px=12))  # Warm-up: the first call loads the font
+    durations = []
+    for _ in range(repeat):
+        start = perf_counter()
+        build_led_image(parse_colored_text_fixed(text, font_px=12))
+        durations.append(perf_counter() - start)
+    return _summary(durations)
+
+def bench_detection(repeat, frames=SAMPLE_FRAMES):
+    """Time passenger detection on the sample frames (first call, which loads the model, is excluded)."""
+    try:
+        import cv2
+        from passengers.detection import process_frame
+    except ImportError as e:
+        return _skipped(f"detection ({e})")
+
+    images = [image for image in (cv2.imread(path) for path in frames) if image is not None]
+    if not images:
+        return _skipped("detection (no sample frames found)")
+
+    process_frame(images[0])  # Warm-up: model loading is not part of the per-frame cost
+    durations = []
+    for i in range(repeat):
+        start = perf_counter()
+        process_frame(images[i % len(images)])
+        durations.append(perf_counter() - start)
+    return _summary(durations)
+
+def run_benchmarks(args):
+    shapes_dict, stops_info = build_network(args.shapes, args.points, args.stops, seed=args.seed)
+    fleet = build_fleet(shapes_dict, args.buses, seed=args.seed)
+
+    stages = bench_map_matching(shapes_dict, stops_info, fleet, args.ticks, args.tick_seconds)
+    fleet = build_fleet(shapes_dict, args.buses, seed=args.seed)  # Same trajectories for the planar stages
+    stages.update(bench_planar_matching(shapes_dict, stops_info, fleet, args.ticks, args.tick_seconds))
+    stages["render"] = bench_rendering(args.render_repeat)
+    stages["detection"] = bench_detection(args.detection_repeat) if args.detection else _skipped("detection (disabled)")
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "config": {
+            "shapes": args.shapes,
+            "points_per_shape": args.points,
+            "stops_per_shape": args.stops,
+            "buses_per_shape": args.buses,
+            "ticks": args.ticks,
+            "tick_seconds": args.tick_seconds,
+            "seed": args.seed
+        },
+        "stages": stages
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Compare the median time of every stage against the baseline.
+
+    Returns:
+        list: Names of the stages that regressed more than `tolerance` (e.g. 0.2 = 20% slower)
+    """
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage, {})
+        if "p50_ms" not in current or "p50_ms" not in previous or not previous["p50_ms"]:
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        current["baseline_p50_ms"] = previous["p50_ms"]
+        current["ratio"] = round(ratio, 3)
+        if min(current["calls"], previous.get("calls", 0)) < MIN_GATED_CALLS:
+            status = f"not gated (< {MIN_GATED_CALLS} calls)"
+        elif ratio > 1 + tolerance:
+            status = "REGRESSION"
+        else:
+            status = "ok"
+        if status == "REGRESSION":
+            regressions.append(stage)
+        print(f"{stage:28s} {previous['p50_ms']:10.4f} ms -> {current['p50_ms']:10.4f} ms  x{ratio:.2f}  {status}")
+
+    if baseline.get("config") != results["config"]:
+        print("Warning: baseline was recorded with a different configuration.")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VMS pipeline on a synthetic network")
+    parser.add_argument("--shapes", type=int, default=5, help="Number of shapes in the network")
+    parser.add_argument("--points", type=int, default=300, help="Points per shape")
+    parser.add_argument("--stops", type=int, default=15, help="Stops per shape")
+    parser.add_argument("--buses", type=int, default=10, help="Buses per shape")
+    parser.add_argument("--ticks", type=int, default=10, help="Number of simulated ticks")
+    parser.add_argument("--tick-seconds", type=float, default=30, help="Simulated seconds between ticks")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the network and fleet")
+    parser.add_argument("--render-repeat", type=int, default=20,
+                        help=f"Number of signs to render (at least {MIN_GATED_CALLS} to be checked against the baseline)")
+    parser.add_argument("--detection", action="store_true", help="Also benchmark passenger detection")
+    parser.add_argument("--detection-repeat", type=int, default=10,
+                        help=f"Number of frames to run detection on (at least {MIN_GATED_CALLS} to be checked against the baseline)")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Synthetic GTFS networks and bus fleets for benchmarking.
+
+The generated structures have the same shape as the ones returned by
+read_route_coordinates and read_stops_info, so they can be passed directly to the
+map-matching functions.
+"""
+
+import math
+import random
+
+from gps.gps_data_generator import GPSDataGenerator
+from gps.map_matching import _calculate_segment_length
+
+# Reference point around Lima
+ORIGIN_LAT = -12.08125
+ORIGIN_LON = -77.00491
+METERS_PER_DEGREE = 111320.0
+
+def build_network(num_shapes=5, points_per_shape=200, stops_per_shape=10, segment_length=80.0, seed=0):
+    """
+    Build a synthetic network of shapes with stops placed on shape points.
+
+    Each shape is a random walk (with a smooth heading change) starting near Lima.
+
+    Args:
+        num_shapes (int): Number of shapes (routes)
+        points_per_shape (int): Number of points in each shape
+        stops_per_shape (int): Number of stops in each shape (placed on shape points)
+        segment_length (float): Average distance between consecutive shape points (meters)
+        seed (int): Random seed, so the same network is built on every run
+
+    Returns:
+        tuple: (shapes_dict, stops_info) with the same format as read_route_coordinates and read_stops_info
+    """
+    rng = random.Random(seed)
+    shapes_dict = {}
+    stops_info = {}
+
+    for shape_number in range(num_shapes):
+        shape_id = str(shape_number + 1)
+        lat = ORIGIN_LAT + rng.uniform(-0.05, 0.05)
+        lon = ORIGIN_LON + rng.uniform(-0.05, 0.05)
+        heading = rng.uniform(0, 2 * math.pi)
+        accumulated_distance = 0.0
+        points = []
+
+        for sequence in range(1, points_per_shape + 1):
+            if points:
+                step = segment_length * rng.uniform(0.5, 1.5)
+                heading += rng.uniform(-0.4, 0.4)
+                new_lat = lat + (step * math.cos(heading)) / METERS_PER_DEGREE
+                new_lon = lon + (step * math.sin(heading)) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+                accumulated_distance += _calculate_segment_length((lat, lon), (new_lat, new_lon))
+                lat, lon = round(new_lat, 6), round(new_lon, 6)
+            points.append((sequence, lat, lon, round(accumulated_distance, 1)))
+        shapes_dict[shape_id] = points
+
+        # Stops are spread evenly along the shape (never on the first point)
+        stride = max(1, (points_per_shape - 1) // max(1, stops_per_shape))
+        for stop_number, index in enumerate(range(stride, points_per_shape, stride)[:stops_per_shape]):
+            _, stop_lat, stop_lon, _ = points[index]
+            stops_info[f"PAR_{shape_id}_{stop_number + 1}"] = {
+                "name": f"Paradero {shape_id}-{stop_number + 1}",
+                "latitude": stop_lat,
+                "longitude": stop_lon,
+                "location_type": "0"
+            }
+
+    return shapes_dict, stops_info
+
+def shape_coordinates(shapes_dict, shape_id):
+    """Return the (lat, lon) list of one shape, as used by the map-matching functions."""
+    return [(lat, lon) for seq, lat, lon, acc_dist in shapes_dict[shape_id]]
+
+class SimulatedBus(GPSDataGenerator):
+    """
+    GPS generator that moves along a shape at a given speed, adding GPS noise to each fix.
+
+    Args:
+        bus_id (str): Bus identifier
+        route_id (str): Route (shape) identifier
+        coordinates (list): (lat, lon) points of the shape to follow
+        speed (float): Speed in km/h
+        start_distance (float): Starting position along the shape (meters)
+        gps_noise (float): Standard deviation of the GPS noise (meters)
+        seed (int): Random seed for the GPS noise
+    """
+
+    def __init__(self, bus_id, route_id, coordinates, speed=25.0, start_distance=0.0, gps_noise=5.0, seed=None):
+        self.coordinates = coordinates
+        self.segment_lengths = [_calculate_segment_length(coordinates[i], coordinates[i + 1]) for i in range(len(coordinates) - 1)]
+        self.total_length = sum(self.segment_lengths)
+        self.distance = start_distance % self.total_length if self.total_length else 0.0
+        self.gps_noise = gps_noise
+        self._rng = random.Random(seed)
+
+        lat, lon = coordinates[0]
+        super().__init__(bus_id, route_id, lat, lon, speed, 0.0)
+        self._update_position()
+
+    def _update_position(self):
+        # Locate the segment that contains the current distance
+        remaining = self.distance
+        for i, seg_length in enumerate(self.segment_lengths):
+            if remaining <= seg_length or i == len(self.segment_lengths) - 1:
+                break
+            remaining -= seg_length
+        (lat1, lon1), (lat2, lon2) = self.coordinates[i], self.coordinates[i + 1]
+        t = remaining / seg_length if seg_length else 0.0
+
+        lat = lat1 + t * (lat2 - lat1)
+        lon = lon1 + t * (lon2 - lon1)
+        # GPS noise in meters converted to degrees
+        lat += self._rng.gauss(0, self.gps_noise) / METERS_PER_DEGREE
+        lon += self._rng.gauss(0, self.gps_noise) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+
+        self.latitude, self.longitude = lat, lon
+        self.course = math.degrees(math.atan2((lon2 - lon1) * math.cos(math.radians(lat1)), lat2 - lat1)) % 360
+
+    def advance(self, seconds):
+        """Move the bus `seconds` seconds forward along its shape (wrapping at the end)."""
+        self.distance = (self.distance + self.speed / 3.6 * seconds) % self.total_length
+        self._update_position()
+        return self.send_data()
+
+def build_fleet(shapes_dict, buses_per_shape=10, seed=0):
+    """
+    Build a fleet of buses spread along every shape of the network.
+
+    Returns:
+        list: SimulatedBus objects
+    """
+    rng = random.Random(seed)
+    fleet = []
+    for shape_id in shapes_dict:
+        coordinates = shape_coordinates(shapes_dict, shape_id)
+        for bus_number in range(buses_per_shape):
+            bus = SimulatedBus(
+                bus_id=f"BUS_{shape_id}_{bus_number + 1}",
+                route_id=shape_id,
+                coordinates=coordinates,
+                speed=rng.uniform(15, 40),
+                start_distance=rng.uniform(0, 1e6),
+                seed=rng.randrange(2**32)
+            )
+            fleet.append(bus)
+    return fleet
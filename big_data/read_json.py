@@ -1,5 +1,7 @@
 import json
+from monitoring.instrumentation import timed
 
+@timed("read_time_between_stations")
 def read_time_between_stations(json_path: str, name: str):
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -0,0 +1,274 @@
+"""
+Shared-memory handoff of the latest fleet state between processes.
+
+The ingest/matching process writes the latest position of every bus and the ETA
+table per stop once per tick into a fixed-layout shared-memory segment. Any number
+of worker processes (renderers, HTTP servers, ...) read it zero-copy through NumPy
+views, without pickling dicts through queues.
+
+Consistency uses a seqlock: the writer makes the sequence number odd while it
+writes and even when it is done. A reader accepts a read only if the sequence was
+even and unchanged before and after reading, otherwise it retries. There must be a
+single writer per segment.
+
+Usage:
+    # Ingest process
+    state = FleetState.create("vms_fleet")
+    state.write(vehicles, etas)
+
+    # Worker process
+    state = FleetState.attach("vms_fleet")
+    vehicles, etas, seq = state.snapshot()
+"""
+
+import sys
+from datetime import datetime
+from multiprocessing import shared_memory
+from time import sleep, time
+
+import numpy as np
+
+LAYOUT_VERSION = 1
+
+# Header (int64): seq, n_vehicles, n_etas, write time (ms), max_vehicles, max_etas, layout version, reserved
+HEADER_FIELDS = 8
+H_SEQ, H_VEHICLES, H_ETAS, H_TIME_MS, H_MAX_VEHICLES, H_MAX_ETAS, H_VERSION = range(7)
+
+# Identifiers are stored as fixed-length bytes so Traccar numeric ids and GTFS string ids both fit
+VEHICLE_DTYPE = np.dtype([
+    ("bus_id", "S24"),
+    ("route_id", "S24"),
+    ("latitude", "f8"),
+    ("longitude", "f8"),
+    ("speed", "f8"),
+    ("course", "f8"),
+    ("timestamp", "f8"),        # Unix time of the GPS fix
+    ("passengers", "i4"),       # -1 if unknown
+    ("segment_index", "i4"),    # -1 if not matched
+    ("distance_along", "f8"),   # Meters from the start of the route
+    ("next_stop_id", "S24"),
+], align=True)
+
+ETA_DTYPE = np.dtype([
+    ("stop_id", "S24"),
+    ("route_id", "S24"),
+    ("bus_id", "S24"),
+    ("eta_seconds", "f8"),
+    ("remaining_distance", "f8"),
+    ("capacity", "S16"),
+], align=True)
+
+def _segment_size(max_vehicles, max_etas):
+    return HEADER_FIELDS * 8 + max_vehicles * VEHICLE_DTYPE.itemsize + max_etas * ETA_DTYPE.itemsize
+
+def _attach_shared_memory(name):
+    # Before Python 3.13 every process that attaches registers the segment in its resource
+    # tracker, which unlinks it when that process exits. Only the creator should own it.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    from multiprocessing import resource_tracker
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def _to_bytes(value):
+    if value is None:
+        return b""
+    return str(value).encode("utf-8")
+
+def _to_unix(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return timestamp or 0.0
+
+class FleetState:
+    """
+    Fixed-layout shared-memory segment with the latest fleet state and ETA table.
+
+    Use FleetState.create (writer) or FleetState.attach (readers) instead of the constructor.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+
+        if self.header[H_VERSION] != LAYOUT_VERSION:
+            raise ValueError(f"Shared fleet state {shm.name} has layout {self.header[H_VERSION]}, expected {LAYOUT_VERSION}")
+        self.max_vehicles = int(self.header[H_MAX_VEHICLES])
+        self.max_etas = int(self.header[H_MAX_ETAS])
+
+        offset = HEADER_FIELDS * 8
+        self.vehicles = np.ndarray((self.max_vehicles,), dtype=VEHICLE_DTYPE, buffer=shm.buf, offset=offset)
+        offset += self.max_vehicles * VEHICLE_DTYPE.itemsize
+        self.etas = np.ndarray((self.max_etas,), dtype=ETA_DTYPE, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, name=None, max_vehicles=1024, max_etas=4096):
+        """
+        Create the segment (writer side). The creator owns it and should call unlink() on shutdown.
+
+        Args:
+            name (str): Segment name shared with the readers (random if None)
+            max_vehicles (int): Capacity of the vehicle table
+            max_etas (int): Capacity of the ETA table
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(max_vehicles, max_etas))
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[H_MAX_VEHICLES] = max_vehicles
+        header[H_MAX_ETAS] = max_etas
+        header[H_VERSION] = LAYOUT_VERSION
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to an existing segment (reader side)."""
+        return cls(_attach_shared_memory(name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        """Current sequence number (even = consistent, odd = write in progress)."""
+        return int(self.header[H_SEQ])
+
+    # --- Writer ---
+
+    def write_arrays(self, vehicles, etas):
+        """
+        Publish a new state from structured arrays (VEHICLE_DTYPE / ETA_DTYPE).
+
+        Rows beyond the table capacity are dropped with a warning.
+        """
+        if len(vehicles) > self.max_vehicles or len(etas) > self.max_etas:
+            print(f"Warning: Fleet state truncated to {self.max_vehicles} vehicles / {self.max_etas} ETAs.")
+            vehicles = vehicles[:self.max_vehicles]
+            etas = etas[:self.max_etas]
+
+        self.header[H_SEQ] += 1  # Odd: readers will retry
+        self.vehicles[:len(vehicles)] = vehicles
+        self.etas[:len(etas)] = etas
+        self.header[H_VEHICLES] = len(vehicles)
+        self.header[H_ETAS] = len(etas)
+        self.header[H_TIME_MS] = int(time() * 1000)
+        self.header[H_SEQ] += 1  # Even: consistent again
+
+    def write(self, vehicles, etas=()):
+        """
+        Publish a new state from dictionaries.
+
+        Args:
+            vehicles (list): Dicts like GPSDataGenerator.send_data() output, optionally with
+                             passengers, segment_index, distance_along and next_stop_id
+            etas (list): Dicts with stop_id, route_id, bus_id, eta_seconds, remaining_distance, capacity
+        """
+        # Filled column by column: assigning NumPy records one by one is much slower
+        vehicle_rows = np.zeros(len(vehicles), dtype=VEHICLE_DTYPE)
+        if vehicles:
+            vehicle_rows["bus_id"] = [_to_bytes(v.get("bus")) for v in vehicles]
+            vehicle_rows["route_id"] = [_to_bytes(v.get("route_id")) for v in vehicles]
+            vehicle_rows["latitude"] = [v["latitude"] for v in vehicles]
+            vehicle_rows["longitude"] = [v["longitude"] for v in vehicles]
+            vehicle_rows["speed"] = [v.get("speed") or 0.0 for v in vehicles]
+            vehicle_rows["course"] = [v.get("course") or 0.0 for v in vehicles]
+            vehicle_rows["timestamp"] = [_to_unix(v.get("timestamp")) for v in vehicles]
+            vehicle_rows["passengers"] = [-1 if v.get("passengers") is None else v["passengers"] for v in vehicles]
+            vehicle_rows["segment_index"] = [v.get("segment_index", -1) for v in vehicles]
+            vehicle_rows["distance_along"] = [v.get("distance_along", np.nan) for v in vehicles]
+            vehicle_rows["next_stop_id"] = [_to_bytes(v.get("next_stop_id")) for v in vehicles]
+
+        eta_rows = np.zeros(len(etas), dtype=ETA_DTYPE)
+        if etas:
+            eta_rows["stop_id"] = [_to_bytes(e.get("stop_id")) for e in etas]
+            eta_rows["route_id"] = [_to_bytes(e.get("route_id")) for e in etas]
+            eta_rows["bus_id"] = [_to_bytes(e.get("bus_id")) for e in etas]
+            eta_rows["eta_seconds"] = [e.get("eta_seconds", np.nan) for e in etas]
+            eta_rows["remaining_distance"] = [e.get("remaining_distance", np.nan) for e in etas]
+            eta_rows["capacity"] = [_to_bytes(e.get("capacity")) for e in etas]
+
+        self.write_arrays(vehicle_rows, eta_rows)
+
+    # --- Readers ---
+
+    def read(self, reader, max_retries=1000):
+        """
+        Zero-copy read: call reader(vehicles, etas) on views of the shared tables and return
+        its result once the read is known to be consistent. The views are only valid inside
+        reader; copy anything that must outlive the call.
+
+        Returns:
+            tuple: (reader result, seq of the state that was read)
+        """
+        for attempt in range(max_retries):
+            seq_before = int(self.header[H_SEQ])
+            if seq_before % 2 == 0:
+                n_vehicles = int(self.header[H_VEHICLES])
+                n_etas = int(self.header[H_ETAS])
+                result = reader(self.vehicles[:n_vehicles], self.etas[:n_etas])
+                if int(self.header[H_SEQ]) == seq_before:
+                    return result, seq_before
+            sleep(0 if attempt < 10 else 0.0005)  # Writer in progress: yield and retry
+        raise TimeoutError(f"Could not get a consistent read of {self.name} after {max_retries} retries")
+
+    def snapshot(self):
+        """
+        Consistent copy of the current state.
+
+        Returns:
+            tuple: (vehicles array, etas array, seq)
+        """
+        (vehicles, etas), seq = self.read(lambda vehicles, etas: (vehicles.copy(), etas.copy()))
+        return vehicles, etas, seq
+
+    def etas_for_stop(self, stop_id):
+        """Consistent copy of the ETA rows of one stop, sorted by ETA."""
+        key = _to_bytes(stop_id)
+
+        def select(vehicles, etas):
+            rows = etas[etas["stop_id"] == key]  # Boolean indexing already copies
+            return np.sort(rows, order="eta_seconds")
+
+        rows, _ = self.read(select)
+        return rows
+
+    def wait_for_update(self, last_seq, timeout=None, poll_interval=0.01):
+        """
+        Block until the state changes after `last_seq`.
+
+        Returns:
+            bool: True if there is a newer state, False on timeout
+        """
+        deadline = None if timeout is None else time() + timeout
+        while True:
+            seq = int(self.header[H_SEQ])
+            if seq != last_seq and seq % 2 == 0:
+                return True
+            if deadline is not None and time() >= deadline:
+                return False
+            sleep(poll_interval)
+
+    def close(self):
+        # The NumPy views must be released before the buffer can be closed
+        del self.header, self.vehicles, self.etas
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the segment (writer side, on shutdown)."""
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        self.unlink()
@@ -0,0 +1,165 @@
+"""
+Local planar geometry for map matching.
+
+Shapes are converted once, at load time, to a local equirectangular frame in meters
+(x east, y north) and stored as float arrays together with their cumulative lengths.
+Incoming GPS fixes are converted in bulk, so projecting a bus onto a shape and
+measuring the remaining distance to a stop become plain planar arithmetic.
+
+Compared to find_closest_projection (Euclidean math in raw degrees, which stretches
+longitude by 1/cos(lat)) and point_to_segment_distance (one haversine per segment),
+this is both faster and more accurate. Around Lima the equirectangular error is
+well below a meter over the size of a route.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371000  # meters, same radius as _calculate_segment_length
+
+class LocalProjection:
+    """
+    Equirectangular projection around a reference point.
+
+    Args:
+        origin_lat (float): Reference latitude (degrees)
+        origin_lon (float): Reference longitude (degrees)
+    """
+
+    def __init__(self, origin_lat: float, origin_lon: float):
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.meters_per_rad_lat = EARTH_RADIUS
+        self.meters_per_rad_lon = EARTH_RADIUS * math.cos(math.radians(origin_lat))
+
+    @classmethod
+    def for_coordinates(cls, coordinates):
+        """Projection centered on the bounding box of a list of (lat, lon) tuples."""
+        lats = [lat for lat, lon in coordinates]
+        lons = [lon for lat, lon in coordinates]
+        return cls((min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2)
+
+    def to_xy(self, lats, lons):
+        """
+        Convert latitudes/longitudes (scalars or arrays, degrees) to local x, y (meters).
+
+        Returns:
+            tuple: (x, y) as float arrays
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        x = np.radians(lons - self.origin_lon) * self.meters_per_rad_lon
+        y = np.radians(lats - self.origin_lat) * self.meters_per_rad_lat
+        return x, y
+
+    def to_latlon(self, x, y):
+        """
+        Convert local x, y (meters) back to latitudes/longitudes (degrees).
+
+        Returns:
+            tuple: (lat, lon) as float arrays
+        """
+        lat = self.origin_lat + np.degrees(np.asarray(y, dtype=np.float64) / self.meters_per_rad_lat)
+        lon = self.origin_lon + np.degrees(np.asarray(x, dtype=np.float64) / self.meters_per_rad_lon)
+        return lat, lon
+
+class ProjectedShape:
+    """
+    A route polyline precomputed in the local metric frame.
+
+    Args:
+        coordinates (list): (lat, lon) tuples of the route, as returned by read_route_coordinates
+        projection (LocalProjection): Shared projection (by default, one centered on the route)
+    """
+
+    def __init__(self, coordinates, projection: LocalProjection = None):
+        if len(coordinates) < 2:
+            raise ValueError(f"A shape needs at least 2 points, got {len(coordinates)}")
+
+        self.coordinates = coordinates
+        self.projection = projection or LocalProjection.for_coordinates(coordinates)
+
+        points = np.asarray(coordinates, dtype=np.float64)
+        self.x, self.y = self.projection.to_xy(points[:, 0], points[:, 1])
+
+        # Segment vectors and lengths
+        self.dx = np.diff(self.x)
+        self.dy = np.diff(self.y)
+        self.length_sq = self.dx * self.dx + self.dy * self.dy
+        self.segment_lengths = np.sqrt(self.length_sq)
+        # Degenerate segments (repeated points) project onto their start point
+        self._inv_length_sq = np.divide(1.0, self.length_sq, out=np.zeros_like(self.length_sq), where=self.length_sq > 0)
+
+        # Distance along the route from the first point to each point
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.segment_lengths)))
+
+    @property
+    def total_length(self) -> float:
+        return float(self.cumulative[-1])
+
+    def project_xy(self, px, py):
+        """
+        Project points already in the local frame onto the shape.
+
+        Args:
+            px, py (np.ndarray): Coordinates (meters) of N points
+
+        Returns:
+            tuple: (segment_index, t, distance_along, offset) arrays of length N, where t is the
+                   position within the segment (0-1), distance_along is measured from the first
+                   point of the shape and offset is the distance from the point to the shape
+        """
+        px = np.atleast_1d(np.asarray(px, dtype=np.float64))[:, None]
+        py = np.atleast_1d(np.asarray(py, dtype=np.float64))[:, None]
+
+        # (N points x M segments) projection parameters, clamped to each segment
+        t = ((px - self.x[:-1]) * self.dx + (py - self.y[:-1]) * self.dy) * self._inv_length_sq
+        np.clip(t, 0.0, 1.0, out=t)
+        ex = self.x[:-1] + t * self.dx - px
+        ey = self.y[:-1] + t * self.dy - py
+        dist_sq = ex * ex + ey * ey
+
+        rows = np.arange(dist_sq.shape[0])
+        segment_index = np.argmin(dist_sq, axis=1)
+        best_t = t[rows, segment_index]
+        distance_along = self.cumulative[segment_index] + best_t * self.segment_lengths[segment_index]
+        offset = np.sqrt(dist_sq[rows, segment_index])
+        return segment_index, best_t, distance_along, offset
+
+    def project_many(self, lats, lons):
+        """
+        Project a batch of GPS fixes onto the shape (one conversion for the whole batch).
+
+        Returns:
+            tuple: (segment_index, distance_along, offset) arrays, distances in meters
+        """
+        px, py = self.projection.to_xy(lats, lons)
+        segment_index, _, distance_along, offset = self.project_xy(px, py)
+        return segment_index, distance_along, offset
+
+    def project(self, point):
+        """
+        Planar equivalent of find_closest_projection for a single (lat, lon) fix.
+
+        Returns:
+            tuple: (closest point (lat, lon), segment index, distance along the route in meters)
+        """
+        px, py = self.projection.to_xy(point[0], point[1])
+        segment_index, t, distance_along, _ = self.project_xy(px, py)
+        i = int(segment_index[0])
+        lat, lon = self.projection.to_latlon(self.x[i] + t[0] * self.dx[i], self.y[i] + t[0] * self.dy[i])
+        return (float(lat), float(lon)), i, float(distance_along[0])
+
+    def remaining_distance(self, distance_along, upper_limit_point: int):
+        """
+        Planar equivalent of point_to_segment_distance: meters from a position along the
+        route (as returned by project) to the route point `upper_limit_point`.
+
+        Args:
+            distance_along (float | np.ndarray): Distance along the route of the bus (meters)
+            upper_limit_point (int | np.ndarray): Index of the route point of the next stop
+        """
+        upper_limit_point = np.minimum(upper_limit_point, len(self.cumulative) - 1)
+        remaining = np.round(self.cumulative[upper_limit_point] - distance_along, 2)
+        return float(remaining) if np.ndim(remaining) == 0 else remaining
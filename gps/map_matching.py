@@ -147,6 +147,28 @@ def find_closest_projection(point, polyline):
     
     return closest_point, segment_index
 
+def find_next_stop(route_coordinates: list[tuple[float, float]], segment_index: int, stops_info: dict) -> tuple[str, int]:
+    """
+    Find the first stop located on a route point after the given segment.
+
+    Args:
+        route_coordinates: List of (lat, lon) tuples representing all points of the route
+        segment_index: Index of the segment where the bus is projected
+        stops_info: Dictionary of stops as returned by read_stops_info
+
+    Returns:
+        tuple: (stop_id, index of the route point of that stop). If no stop is found,
+               (None, len(route_coordinates)) so the end of the route is used as limit.
+    """
+    for point_index, coordinates in enumerate(route_coordinates[segment_index + 1:]):
+        lat, lon = coordinates
+        for stop_id, stop_data in stops_info.items():
+            lan_stop, lon_stop = stop_data["latitude"], stop_data["longitude"]
+            if lat == lan_stop and lon == lon_stop:
+                return stop_id, point_index + 1 + segment_index
+
+    return None, len(route_coordinates) # Default to the end of the route
+
 def point_to_segment_distance(route_coordinates: list[tuple[float, float]], segment_index: int, projected_point: tuple[float, float], upper_limit_point: int) -> float:
     """
     Calculate the remaining distance from the projected point to the upper limit point along the route.
@@ -1,104 +1,449 @@
-from passengers.detection import process_image
+import argparse
 import json
-from gps.map_matching import *
-from vms.vms_display import parse_colored_text_fixed, build_led_image
+import os
+from gps.map_matching import read_route_coordinates, find_next_stop
 from gps.gps_data_generator import GPSDataGenerator
-from traccar.connection import obtener_coordenadas
 from time import sleep
 from gps.gtfs_functions import read_stops_info
 from big_data.read_json import read_time_between_stations
 from time import time
+from monitoring.instrumentation import timed, observe
+
+# NOTE: Heavy subsystems are imported on first use, not here:
+#   - passengers.* pulls cv2, numpy and ultralytics/torch (only needed in "full" mode)
+#   - vms.vms_display pulls PIL (not needed in "matching" mode)
+#   - traccar.connection pulls requests (not needed in "render" mode)
+# This keeps startup time and RSS low for rendering-only and matching-only workers.
+
+MODES = ("full", "matching", "render")
+
+def capacity_level(passengers_count):
+    """Convert a passenger count into the capacity level shown on the sign."""
+    if passengers_count is None:
+        return "N/A"
+    elif passengers_count >= 30:
+        return "Alto"
+    elif passengers_count >= 15:
+        return "Medio"
+    elif passengers_count >= 0:
+        return "Bajo"
+    return "N/A"
+
+def render_sign(text, output_path="led_image.png", sign_cache=None, sign_id="default"):
+    from vms.vms_display import parse_colored_text_fixed, build_led_image, build_led_matrix
+
+    mask_with_colors = parse_colored_text_fixed(text, font_px = 12)
+    img = build_led_image(mask_with_colors)
+    img.save(output_path)
+    # Encoded once here; HTTP clients are served from the cache, never re-rendered
+    if sign_cache is not None:
+        sign_cache.publish_sign(sign_id, img, build_led_matrix(mask_with_colors))
+    return img
+
+def sign_lines(data):
+    """Sign lines from a GTFS-RT VehiclePositions snapshot or from a list of precomputed ETAs."""
+    lines = []
+    if isinstance(data, dict) and "entity" in data:
+        from vms.vms_from_vehicle_positions import build_vms_lines
+
+        for entity in data["entity"]:
+            if "vehicle" in entity:
+                lines.extend(build_vms_lines(entity))
+    else:
+        for eta in data:
+            lines.append(f"Ruta {eta['route_id']} >> {int(eta['eta_seconds'])} seg >> {eta.get('capacity', 'N/A')}")
+    return lines
+
+def camera_options(camera_uri, camera_interval, camera_loop):
+    """
+    open_frame_source options for a --camera value. Image directories are paced at
+    `camera_interval` seconds per image (otherwise the whole directory is decoded at once);
+    directories and video files start again at the end if `camera_loop` is set.
+    """
+    from passengers.frame_source import STREAM_PREFIXES
+
+    if camera_uri.lower().startswith(STREAM_PREFIXES):
+        return {}
+    if os.path.isdir(camera_uri):
+        return {"interval": camera_interval, "loop": camera_loop}
+    return {"loop": camera_loop}
+
+def start_metrics(metrics_port):
+    """Enable instrumentation, serve it in Prometheus text format and toggle cProfile with SIGUSR1 (no-op if metrics_port is 0)."""
+    if not metrics_port:
+        return
+    from monitoring.instrumentation import enable
+    from monitoring.endpoint import start_metrics_server
+    from monitoring.profiling import install_profiler_signal
+
+    enable()
+    start_metrics_server(metrics_port)
+    install_profiler_signal()
+
+def start_sign_cache(http_port):
+    """
+    Start the local HTTP API that serves sign frames and arrivals per stop from an in-memory cache.
+
+    Returns:
+        SignCache | None: Cache to publish to, or None if http_port is 0
+    """
+    if not http_port:
+        return None
+    from vms.http_api import SignCache, start_sign_server
+
+    sign_cache = SignCache()
+    start_sign_server(sign_cache, http_port)
+    return sign_cache
+
+def serve_until_interrupted():
+    """Keep the process (and the HTTP server thread) alive after a one-shot render."""
+    print("Serving the last frame, press Ctrl+C to stop.")
+    try:
+        while True:
+            sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+def render_main(source_path, output_path="led_image.png", replay_path=None, speed=1.0, http_port=0, metrics_port=0):
+    """
+    Rendering-only mode: build the sign from a GTFS-RT VehiclePositions JSON feed or from a
+    JSON list of precomputed ETAs ([{"route_id": ..., "eta_seconds": ..., "capacity": ...}]).
+    With replay_path, re-render it for every GTFS-RT snapshot of a recorded log instead.
+    With http_port, the sign is also served over HTTP until Ctrl+C.
+    Neither the vision stack nor Traccar are imported.
+    """
+    start_metrics(metrics_port)
+    sign_cache = start_sign_cache(http_port)
+    if replay_path:
+        from traccar.replay import PositionReplayer
+
+        replayer = PositionReplayer(replay_path, speed)
+        snapshots = iter(replayer.next_gtfs_rt, None)
+    else:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            snapshots = [json.load(f)]
+
+    for data in snapshots:
+        lines = sign_lines(data)
+        if not lines:
+            print("Error: Nothing to render.")
+            continue
+
+        text = "\n".join(lines)
+        render_sign(text, output_path, sign_cache=sign_cache)
+        print(text)
+
+    if sign_cache is not None:
+        serve_until_interrupted()
+
+def arrivals_by_stop(etas):
+    """
+    Group the rows of a shared ETA table (gps.fleet_state.ETA_DTYPE) by stop.
+
+    Returns:
+        dict: stop_id -> list of arrivals sorted by ETA, in the format published by the main loop
+    """
+    updated = int(time())
+    stops = {}
+    for eta in sorted(etas, key=lambda row: row["eta_seconds"]):
+        stop_id = eta["stop_id"].decode()
+        if not stop_id:
+            continue
+        stops.setdefault(stop_id, []).append({
+            "route_id": eta["route_id"].decode(),
+            "bus_id": eta["bus_id"].decode(),
+            "eta_seconds": int(eta["eta_seconds"]),
+            "remaining_distance": float(eta["remaining_distance"]),
+            "capacity": eta["capacity"].decode(),
+            "updated": updated
+        })
+    return stops
+
+def render_shared_main(shared_state_name, output_path="led_image.png", iterations=0, timeout=60, http_port=0, metrics_port=0):
+    """
+    Rendering worker: re-render one sign per stop every time the ingest process publishes a
+    new fleet state in shared memory. Nothing is pickled or sent through queues. Each sign is
+    saved next to output_path with the stop id appended (led_image_<stop_id>.png).
+    With http_port, the signs and the arrivals of every stop are also served over HTTP.
+
+    If no update arrives within `timeout` seconds the worker re-attaches, so it picks up
+    the new segment when the ingest process restarts. `timeout` must be longer than the
+    ingest interval, otherwise a healthy segment is re-attached (and re-rendered) every tick.
+    """
+    from gps.fleet_state import FleetState
+
+    start_metrics(metrics_port)
+    sign_cache = start_sign_cache(http_port)
+    fleet_state = None
+    last_seq = -1
+    count = 0
+    try:
+        while not iterations or count < iterations:
+            if fleet_state is None:
+                try:
+                    fleet_state = FleetState.attach(shared_state_name)
+                except FileNotFoundError:
+                    # The ingest process is not running (yet)
+                    print(f"Error: Fleet state {shared_state_name} not found, retrying.")
+                    sleep(1)
+                    continue
+                last_seq = -1
+
+            if not fleet_state.wait_for_update(last_seq, timeout):
+                # A restarted writer creates a new segment: the old mapping never changes again
+                print("Error: No fleet state update received, re-attaching.")
+                fleet_state.close()
+                fleet_state = None
+                continue
+            vehicles, etas, last_seq = fleet_state.snapshot()
+            for stop_id, arrivals in arrivals_by_stop(etas).items():
+                text = "\n".join(sign_lines(arrivals))
+                root, extension = os.path.splitext(output_path)
+                render_sign(text, f"{root}_{stop_id}{extension}", sign_cache=sign_cache, sign_id=stop_id)
+                if sign_cache is not None:
+                    sign_cache.publish_arrivals(stop_id, arrivals)
+                print(f"[{stop_id}] {text}")
+            count += 1
+    finally:
+        if fleet_state is not None:
+            fleet_state.close()
+
+def main(mode="full", iterations=6, interval=30, metrics_port=0, record_path=None, replay_path=None, speed=1.0, http_port=0,
+         shared_state_name=None, camera_uri=None, detector="ultralytics", detector_options=None, camera_interval=None,
+         camera_loop=False):
+    # An image directory advances one image per tick unless told otherwise
+    if camera_interval is None:
+        camera_interval = interval
 
-def main():
     # GTFS file paths
     shapes_path = "gtfs/static/shapes.txt"
     stops_path = "gtfs/static/stops.txt"
 
+    # Local metrics endpoint (Prometheus text) and cProfile toggled by SIGUSR1
+    start_metrics(metrics_port)
+
+    # Local HTTP API serving sign frames and arrivals per stop from an in-memory cache
+    sign_cache = start_sign_cache(http_port)
+
+    # Latest fleet state and ETA table published in shared memory for worker processes
+    fleet_state = None
+    if shared_state_name:
+        from gps.fleet_state import FleetState
+
+        fleet_state = FleetState.create(shared_state_name)
+
     # Read GTFS files
     route_coordinates, shapes_dict = read_route_coordinates(shapes_path, multipoints=True)
     stops_info = read_stops_info(stops_path)
 
-    # Traccar credentials
-    with open("credentials/credentials_traccar.json", 'r') as cred_file:
-        cred_data = json.load(cred_file)
-        BASE_URL = cred_data["BASE_URL"]
-        USUARIO = cred_data["USUARIO"]
-        PASSWORD = cred_data["PASSWORD"]
+    # Route converted once to a local metric frame (meters): projection and distances are planar
+    from gps.geometry import ProjectedShape
+    route_shape = ProjectedShape(route_coordinates)
 
-    count = 0
-    while True:
-        start_time = time()
-        # Traccar coordinates:
-        traccar_bus = obtener_coordenadas(BASE_URL, USUARIO, PASSWORD)
-        if not traccar_bus:
-            print("Error: Could not get bus position from Traccar.")
-            continue
+    replayer = None
+    recorder = None
+    if replay_path:
+        # Positions come from a recorded log instead of a live Traccar server
+        from traccar.replay import PositionReplayer
+
+        replayer = PositionReplayer(replay_path, speed)
+        obtener_coordenadas = replayer.obtener_coordenadas
+        BASE_URL = USUARIO = PASSWORD = None
+        interval = 0 # Pacing comes from the recorded timestamps
+    else:
+        # Traccar credentials
+        with open("credentials/credentials_traccar.json", 'r') as cred_file:
+            cred_data = json.load(cred_file)
+            BASE_URL = cred_data["BASE_URL"]
+            USUARIO = cred_data["USUARIO"]
+            PASSWORD = cred_data["PASSWORD"]
+
+        if record_path:
+            from traccar.replay import PositionRecorder
+
+            recorder = PositionRecorder(record_path)
+            obtener_coordenadas = recorder.obtener_coordenadas
+        else:
+            from traccar.connection import obtener_coordenadas
+
+    frame_source = None
+    if mode == "full":
+        from passengers.detection import process_image, configure_detector
+
+        # Passenger detector: "ultralytics" (PyTorch) or "onnx" (onnxruntime on CPU, no GPU needed)
+        configure_detector(detector, **(detector_options or {}))
+
+        # Frames are decoded in background; inference only runs when the cabin scene changes
+        if camera_uri:
+            from passengers.frame_source import open_frame_source
+            from passengers.motion_gate import GatedPassengerCounter
+
+            frame_source = open_frame_source(camera_uri, **camera_options(camera_uri, camera_interval, camera_loop)).start()
+            passenger_counter = GatedPassengerCounter()
+            camera_finished_reported = False
 
-        BUS = GPSDataGenerator(
-                bus_id = traccar_bus["id"],
-                route_id= traccar_bus["deviceId"], # Using deviceID as route_id for now
-                latitude= traccar_bus["latitude"],
-                longitude= traccar_bus["longitude"],
-                speed = traccar_bus["speed"],
-                course = traccar_bus["course"]
-            )
-        
-        # Find the closest projection on the route and which segment it is on
-        closest_point, segment_index = find_closest_projection((BUS.latitude, BUS.longitude), route_coordinates)
-
-        # Determine the next stop after the closest segment
-        next_stop_id = None
-        upper_limit_point = len(route_coordinates) # Default to the end of the route
-
-        for point_index, coordinates in enumerate(route_coordinates[segment_index + 1:]):
-            lat, lon = coordinates
-            for stop_id, stop_data in stops_info.items():
-                lan_stop, lon_stop = stop_data["latitude"], stop_data["longitude"]
-                if lat == lan_stop and lon == lon_stop:
-                    next_stop_id = stop_id
-                    upper_limit_point = point_index + 1 + segment_index
+    count = 0
+    loop_start = time()
+    try:
+        while True:
+            start_time = time()
+            # Traccar coordinates:
+            traccar_bus = obtener_coordenadas(BASE_URL, USUARIO, PASSWORD)
+            if not traccar_bus:
+                if replayer is not None and replayer.finished:
                     break
-            if next_stop_id:
+                # Failed requests and empty device lists are counted by the Traccar client
+                print("Error: Could not get bus position from Traccar.")
+                continue
+
+            BUS = GPSDataGenerator(
+                    bus_id = traccar_bus["id"],
+                    route_id= traccar_bus["deviceId"], # Using deviceID as route_id for now
+                    latitude= traccar_bus["latitude"],
+                    longitude= traccar_bus["longitude"],
+                    speed = traccar_bus["speed"],
+                    course = traccar_bus["course"]
+                )
+
+            with timed("map_matching"):
+                # Find the closest projection on the route and which segment it is on
+                closest_point, segment_index, distance_along = route_shape.project((BUS.latitude, BUS.longitude))
+
+                # Determine the next stop after the closest segment
+                next_stop_id, upper_limit_point = find_next_stop(route_coordinates, segment_index, stops_info)
+
+                remain_distance_to_station = route_shape.remaining_distance(distance_along, upper_limit_point)
+
+            # Process images for passenger detection
+            passengers_count = None
+            if mode == "full":
+                if frame_source is not None:
+                    frame = frame_source.read_latest(timeout=5)
+                    if frame is not None:
+                        passengers_count = passenger_counter.count(frame)
+                    else:
+                        # The last count is reused for at most max_age seconds, then shown as N/A
+                        passengers_count = passenger_counter.cached_count()
+                        if frame_source.finished and not camera_finished_reported:
+                            print(f"Warning: Camera source {camera_uri} has no more frames.")
+                            camera_finished_reported = True
+                else:
+                    # For testing, we use a placeholder image path
+                    test_image_path = "passengers_1.png"
+                    passengers_count = process_image(test_image_path)
+            capacity = capacity_level(passengers_count)
+
+            # Big Data reading through API
+            # For testing, we use a placeholder JSON path
+            big_data_json_path = "big_data.json" # NOTE: Replace with actual API call
+            station_name = next_stop_id
+            total_length, total_arrival_time = read_time_between_stations(big_data_json_path, station_name)
+
+            # Compute ETA based on remaining distance
+            text = f"Ruta {BUS.route_id} >> Sin ETA (parada {next_stop_id})"
+            if total_length and total_arrival_time and remain_distance_to_station is not None:
+                eta_seconds = (remain_distance_to_station / total_length) * total_arrival_time
+                text = f"Ruta {BUS.route_id} >> {int(eta_seconds)} seg >> {capacity}"
+                if mode == "full":
+                    render_sign(text, sign_cache=sign_cache, sign_id=next_stop_id)
+                if sign_cache is not None:
+                    sign_cache.publish_arrivals(next_stop_id, [{
+                        "route_id": BUS.route_id,
+                        "bus_id": BUS.bus,
+                        "eta_seconds": int(eta_seconds),
+                        "remaining_distance": remain_distance_to_station,
+                        "capacity": capacity,
+                        "updated": int(time())
+                    }])
+
+            if fleet_state is not None:
+                vehicle = BUS.send_data()
+                vehicle.update(passengers=passengers_count, segment_index=segment_index,
+                               distance_along=distance_along, next_stop_id=next_stop_id)
+                etas = []
+                if total_length and total_arrival_time and remain_distance_to_station is not None:
+                    etas.append({"stop_id": next_stop_id, "route_id": BUS.route_id, "bus_id": BUS.bus,
+                                 "eta_seconds": eta_seconds, "remaining_distance": remain_distance_to_station,
+                                 "capacity": capacity})
+                fleet_state.write([vehicle], etas)
+
+            count += 1
+            end_time = time()
+            observe("tick", end_time - start_time)
+            print(text)
+            print(f"Iteration {count} completed in {end_time - start_time:.2f} seconds.")
+            if iterations and count >= iterations: # XXX: Limited iterations for testing
                 break
 
-        remain_distance_to_station = point_to_segment_distance(route_coordinates, segment_index, closest_point, upper_limit_point)
-
-        # Process images for passenger detection
-        # TODO: Integrate with actual image source
-        # For testing, we use a placeholder image path
-        test_image_path = "passengers_1.png"
-        passengers_count = process_image(test_image_path)
-        if passengers_count >= 30:
-            capacity = "Alto"
-        elif passengers_count >= 15:
-            capacity = "Medio"
-        elif passengers_count >= 0:
-            capacity = "Bajo"
-        else:
-            capacity = "N/A"
-
-        # Big Data reading through API
-        # For testing, we use a placeholder JSON path
-        big_data_json_path = "big_data.json" # NOTE: Replace with actual API call
-        station_name = next_stop_id
-        total_length, total_arrival_time = read_time_between_stations(big_data_json_path, station_name)
-
-        # Compute ETA based on remaining distance
-        if total_length and total_arrival_time and remain_distance_to_station is not None:
-            eta_seconds = (remain_distance_to_station / total_length) * total_arrival_time
-            text = f"Ruta {BUS.route_id} >> {int(eta_seconds)} seg >> {capacity}"
-            mask_with_colors = parse_colored_text_fixed(text, font_px = 12)
-            img = build_led_image(mask_with_colors)
-            img.save("led_image.png")
-
-        count += 1
-        end_time = time()
-        print(text)
-        print(f"Iteration {count} completed in {end_time - start_time:.2f} seconds.")
-        if count > 5: # XXX: To stop after 5 iterations for testing
-            break
+            sleep(interval)  # Wait before next iteration
+    finally:
+        # Also on Ctrl+C: stop the decoder thread, close the log and remove the shared segment
+        if frame_source is not None:
+            frame_source.stop()
+        if recorder is not None:
+            recorder.close()  # Closes the gzip member, so the log stays readable after Ctrl+C
+        if fleet_state is not None:
+            fleet_state.close()
+            fleet_state.unlink()
+
+    if replayer is not None:
+        elapsed = time() - loop_start
+        print(f"Replayed {count} ticks in {elapsed:.2f} seconds ({count / elapsed if elapsed else 0:.1f} ticks/s).")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bus Information Terminal (VMS)")
+    parser.add_argument("--mode", choices=MODES, default="full",
+                        help="full: whole pipeline; matching: map-matching and ETA only (no vision, no rendering); "
+                             "render: render a sign from a GTFS-RT/ETA JSON file (no vision, no Traccar)")
+    parser.add_argument("--source", default="gtfs/rt/vehiclePositions_Testing.json",
+                        help="JSON file to render in 'render' mode (GTFS-RT VehiclePositions or list of ETAs)")
+    parser.add_argument("--output", default="led_image.png", help="Output image in 'render' mode")
+    parser.add_argument("--iterations", type=int, default=6, help="Number of iterations (0 = run forever)")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between iterations")
+    parser.add_argument("--camera",
+                        help="Cabin camera for passenger counting in 'full' mode: video file, image directory or "
+                             "RTSP/HTTP stream (default: placeholder image passengers_1.png)")
+    parser.add_argument("--camera-interval", type=float, default=None,
+                        help="Seconds between images when --camera is an image directory (default: --interval)")
+    parser.add_argument("--camera-loop", action="store_true",
+                        help="Start a --camera video file or image directory again when it ends")
+    parser.add_argument("--detector", choices=("ultralytics", "onnx"), default="ultralytics",
+                        help="Passenger detector backend: ultralytics (PyTorch) or onnx (onnxruntime on CPU)")
+    parser.add_argument("--onnx-model", default="weight/yolov8n.onnx",
+                        help="Exported YOLOv8n ONNX model (float32 or INT8) for --detector onnx")
+    parser.add_argument("--imgsz", type=int, default=640,
+                        help="Input resolution for --detector onnx (must match the one used to export the model)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="onnxruntime intra-op threads for --detector onnx (default: chosen by onnxruntime)")
+    parser.add_argument("--record", help="Record every Traccar /api/positions response to this log (.gz to compress)")
+    parser.add_argument("--replay",
+                        help="Replay a recorded log instead of polling Traccar ('render' mode: re-render every recorded GTFS-RT snapshot)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed: 1 = real time, N = N times faster, 0 = as fast as possible")
+    parser.add_argument("--http-port", type=int, default=0,
+                        help="Serve sign frames and arrivals per stop over HTTP on localhost at this port (0 = disabled)")
+    parser.add_argument("--shared-state",
+                        help="Shared-memory segment name for the fleet state: written by 'full'/'matching', "
+                             "read by 'render' workers (which then re-render on every update)")
+    parser.add_argument("--stale-after", type=float, default=None,
+                        help="'render' workers re-attach to the shared state after this many seconds without updates "
+                             "(default: 3 x --interval, so pass the ingest process's --interval)")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Expose Prometheus metrics on localhost at this port and enable SIGUSR1 profiling (0 = disabled)")
+    return parser.parse_args()
 
-        sleep(30)  # Wait before next iteration
+def detector_options(args):
+    if args.detector == "onnx":
+        return {"model_path": args.onnx_model, "imgsz": args.imgsz, "threads": args.threads}
+    return {}
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.mode == "render" and args.shared_state:
+        stale_after = args.stale_after if args.stale_after is not None else 3 * args.interval
+        render_shared_main(args.shared_state, args.output, args.iterations, stale_after, args.http_port, args.metrics_port)
+    elif args.mode == "render":
+        render_main(args.source, args.output, args.replay, args.speed, args.http_port, args.metrics_port)
+    else:
+        main(args.mode, args.iterations, args.interval, args.metrics_port, args.record, args.replay, args.speed, args.http_port, args.shared_state,
+             args.camera, args.detector, detector_options(args), args.camera_interval, args.camera_loop)
@@ -0,0 +1,46 @@
+"""
+Local HTTP endpoint exposing the pipeline metrics in Prometheus text format.
+
+The server only listens on localhost by default and runs in a daemon thread, so it
+never blocks the main loop.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from monitoring.instrumentation import render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """
+    Start the metrics endpoint in a background thread.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Interface to listen on (localhost by default)
+
+    Returns:
+        ThreadingHTTPServer: Running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"Metrics available at http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,168 @@
+"""
+Lightweight instrumentation for the VMS pipeline.
+
+Provides per-stage timers (histograms), event counters and queue-depth gauges.
+Everything is disabled by default: when disabled, a timed function only pays one
+dictionary lookup per call, so the hooks can stay in production code.
+
+Usage:
+    from monitoring.instrumentation import timed, count
+
+    @timed("traccar_fetch")
+    def obtener_coordenadas(...): ...
+
+    with timed("eta"):
+        ...
+
+    count("traccar_fetch_failed")
+"""
+
+import threading
+from functools import wraps
+from time import perf_counter
+
+# Histogram buckets (seconds): from 1 ms (map matching) up to 10 s (slow Traccar/YOLO ticks)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STATE = {"enabled": False}
+_LOCK = threading.Lock()
+
+class Histogram:
+    """Cumulative histogram of durations in seconds (Prometheus style)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        with _LOCK:
+            self.count += 1
+            self.sum += value
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def cumulative_counts(self):
+        """Counts per bucket, accumulated as Prometheus expects (le = less or equal)."""
+        total = 0
+        result = []
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            result.append(total)
+        return result
+
+# Metrics by label: stage -> Histogram, event -> int, queue -> int
+STAGE_DURATIONS = {}
+EVENT_COUNTS = {}
+QUEUE_DEPTHS = {}
+
+def enable():
+    """Enable metric collection (call once at startup)."""
+    _STATE["enabled"] = True
+
+def disable():
+    _STATE["enabled"] = False
+
+def is_enabled():
+    return _STATE["enabled"]
+
+def reset():
+    """Remove all collected metrics."""
+    with _LOCK:
+        STAGE_DURATIONS.clear()
+        EVENT_COUNTS.clear()
+        QUEUE_DEPTHS.clear()
+
+def observe(stage, seconds):
+    """Record a duration (seconds) for a stage."""
+    if not _STATE["enabled"]:
+        return
+    histogram = STAGE_DURATIONS.get(stage)
+    if histogram is None:
+        with _LOCK:
+            histogram = STAGE_DURATIONS.setdefault(stage, Histogram())
+    histogram.observe(seconds)
+
+def count(event, amount=1):
+    """Increment the counter of an event (failed fetches, skipped frames, ...)."""
+    if not _STATE["enabled"]:
+        return
+    with _LOCK:
+        EVENT_COUNTS[event] = EVENT_COUNTS.get(event, 0) + amount
+
+def set_queue_depth(queue, depth):
+    """Set the current depth of a queue or buffer."""
+    if not _STATE["enabled"]:
+        return
+    QUEUE_DEPTHS[queue] = depth
+
+class timed:
+    """
+    Times a stage. Works as a context manager and as a decorator.
+
+    Args:
+        stage (str): Name of the stage (used as the `stage` label)
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._start = None
+
+    def __enter__(self):
+        self._start = perf_counter() if _STATE["enabled"] else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            observe(self.stage, perf_counter() - self._start)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _STATE["enabled"]:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, perf_counter() - start)
+        return wrapper
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics as text (content type text/plain; version=0.0.4)
+    """
+    lines = []
+    with _LOCK:
+        lines.append("# HELP vms_stage_duration_seconds Duration of each pipeline stage.")
+        lines.append("# TYPE vms_stage_duration_seconds histogram")
+        for stage, histogram in sorted(STAGE_DURATIONS.items()):
+            for upper, cumulative in zip(histogram.buckets, histogram.cumulative_counts()):
+                lines.append(f'vms_stage_duration_seconds_bucket{{stage="{stage}",le="{upper}"}} {cumulative}')
+            lines.append(f'vms_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'vms_stage_duration_seconds_sum{{stage="{stage}"}} {_format_value(histogram.sum)}')
+            lines.append(f'vms_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append("# HELP vms_events_total Pipeline events (failed fetches, skipped frames, ...).")
+        lines.append("# TYPE vms_events_total counter")
+        for event, value in sorted(EVENT_COUNTS.items()):
+            lines.append(f'vms_events_total{{event="{event}"}} {value}')
+
+        lines.append("# HELP vms_queue_depth Current depth of internal queues and buffers.")
+        lines.append("# TYPE vms_queue_depth gauge")
+        for queue, value in sorted(QUEUE_DEPTHS.items()):
+            lines.append(f'vms_queue_depth{{queue="{queue}"}} {_format_value(value)}')
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+"""
+On-demand cProfile sampling triggered by a signal.
+
+Send the signal once to start profiling the main loop and once more to stop it:
+the stats are dumped to a .prof file (open it with snakeviz or pstats) and the
+slowest functions are printed.
+
+    kill -USR1 <pid>   # start
+    kill -USR1 <pid>   # stop and dump
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import signal
+from datetime import datetime
+
+_STATE = {"profiler": None}
+
+def _toggle_profiler(output_dir, top):
+    if _STATE["profiler"] is None:
+        profiler = cProfile.Profile()
+        _STATE["profiler"] = profiler
+        profiler.enable()
+        print("PROFILER: Started, send the signal again to stop.")
+        return
+
+    profiler = _STATE["profiler"]
+    profiler.disable()
+    _STATE["profiler"] = None
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"profile_{datetime.now():%Y%m%d_%H%M%S}.prof")
+    profiler.dump_stats(output_path)
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(top)
+    print(summary.getvalue())
+    print(f"PROFILER: Stats saved to {output_path}")
+
+def install_profiler_signal(signum=None, output_dir="profiles", top=20):
+    """
+    Install a signal handler that starts/stops cProfile.
+
+    Args:
+        signum (int): Signal to listen to (SIGUSR1 by default)
+        output_dir (str): Directory where the .prof files are written
+        top (int): Number of functions printed in the summary
+
+    Returns:
+        bool: True if the handler was installed (False on platforms without SIGUSR1, e.g. Windows)
+    """
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        print("PROFILER: Signal-triggered profiling is not available on this platform.")
+        return False
+
+    signal.signal(signum, lambda received_signum, frame: _toggle_profiler(output_dir, top))
+    return True
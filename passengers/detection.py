@@ -1,39 +1,100 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import os
+from monitoring.instrumentation import timed
 
-def _detect_people_in_image(image_path, weights_path='weight/yolov8n.pt'):
+# Modelos ya cargados, indexados por ruta de pesos (evita recargar YOLO en cada llamada)
+_MODELS = {}
+
+# Backend de detección: "ultralytics" (PyTorch) u "onnx" (onnxruntime en CPU)
+DETECTOR_BACKENDS = ("ultralytics", "onnx")
+_BACKEND = {"name": "ultralytics", "options": {}, "detector": None}
+
+def configure_detector(backend: str = "ultralytics", **options):
     """
-    Detecta personas en una imagen usando YOLOv8n y devuelve la imagen con bounding boxes
-    y el número de personas detectadas.
-    
+    Selecciona el backend usado por process_image y process_frame.
+
+    Args:
+        backend (str): "ultralytics" (por defecto) u "onnx"
+        **options: Opciones del backend. Para "ultralytics": weights_path.
+                   Para "onnx": model_path, imgsz, threads, conf_threshold, iou_threshold
+                   (ver passengers.onnx_detector.OnnxPersonDetector)
+    """
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Backend de detección desconocido: {backend}. Opciones: {DETECTOR_BACKENDS}")
+    _BACKEND["name"] = backend
+    _BACKEND["options"] = options
+    _BACKEND["detector"] = None  # Se crea en el primer uso
+
+def _get_onnx_detector():
+    if _BACKEND["detector"] is None:
+        from passengers.onnx_detector import OnnxPersonDetector
+        _BACKEND["detector"] = OnnxPersonDetector(**_BACKEND["options"])
+    return _BACKEND["detector"]
+
+def _load_model(weights_path='weight/yolov8n.pt'):
+    """
+    Carga el modelo YOLOv8n una sola vez y lo reutiliza en llamadas posteriores.
+
     Args:
-        image_path (str): Ruta a la imagen de entrada
         weights_path (str): Ruta a los pesos del modelo YOLOv8n
-    
+
+    Returns:
+        YOLO: Modelo listo para inferencia
+    """
+    if weights_path not in _MODELS:
+        from ultralytics import YOLO
+
+        # Si el archivo de pesos existe localmente, lo usamos; si no, usamos el modelo preentrenado
+        if os.path.exists(weights_path):
+            _MODELS[weights_path] = YOLO(weights_path)
+        else:
+            print(f"Archivo de pesos no encontrado en {weights_path}, usando modelo preentrenado de ultralytics...")
+            _MODELS[weights_path] = YOLO('yolov8n.pt')  # Esto descargará el modelo si no está presente
+    return _MODELS[weights_path]
+
+def _draw_person_box(image, x1, y1, x2, y2):
+    # Dibujar el bounding box en la imagen
+    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+    # Etiquetar el bounding box como 'person'
+    cv2.putText(image, 'person', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+def _detect_people_onnx(image):
+    """
+    Detecta personas con el backend ONNX configurado.
+
     Returns:
         tuple: (imagen con bounding boxes dibujados, número de personas detectadas)
     """
-    # Cargar el modelo YOLOv8n
-    # Si el archivo de pesos existe localmente, lo usamos; si no, usamos el modelo preentrenado
-    if os.path.exists(weights_path):
-        model = YOLO(weights_path)
-    else:
-        print(f"Archivo de pesos no encontrado en {weights_path}, usando modelo preentrenado de ultralytics...")
-        model = YOLO('yolov8n.pt')  # Esto descargará el modelo si no está presente
-    
-    # Leer la imagen
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"No se pudo leer la imagen desde {image_path}")
-    
+    boxes, _ = _get_onnx_detector().detect(image)
+    for box in boxes:
+        _draw_person_box(image, *map(int, box))
+    return image, len(boxes)
+
+def _detect_people_in_frame(image, weights_path=None):
+    """
+    Detecta personas en un frame ya decodificado (BGR) usando el backend configurado.
+
+    Args:
+        image (np.ndarray): Frame BGR de entrada
+        weights_path (str): Ruta a los pesos del modelo YOLOv8n (solo backend "ultralytics")
+
+    Returns:
+        tuple: (imagen con bounding boxes dibujados, número de personas detectadas)
+    """
+    if _BACKEND["name"] == "onnx":
+        return _detect_people_onnx(image)
+
+    weights_path = weights_path or _BACKEND["options"].get("weights_path", 'weight/yolov8n.pt')
+    model = _load_model(weights_path)
+
     # Realizar inferencia
     results = model(image)
-    
+
     # Contador de personas detectadas (clase 0 en COCO es 'person')
     person_count = 0
-    
+
     # Dibujar bounding boxes solo para personas
     for result in results:
         boxes = result.boxes
@@ -43,31 +104,65 @@ def _detect_people_in_image(image_path, weights_path='weight/yolov8n.pt'):
                 if int(box.cls[0]) == 0:  # Clase 0 corresponde a 'person' en COCO
                     # Obtener coordenadas del bounding box
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    
-                    # Dibujar el bounding box en la imagen
-                    cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    
-                    # Etiquetar el bounding box como 'person'
-                    cv2.putText(image, 'person', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                    
+                    _draw_person_box(image, x1, y1, x2, y2)
+
                     # Incrementar contador de personas
                     person_count += 1
-    
+
     return image, person_count
 
+def _detect_people_in_image(image_path, weights_path=None):
+    """
+    Detecta personas en una imagen usando YOLOv8n y devuelve la imagen con bounding boxes
+    y el número de personas detectadas.
+
+    Args:
+        image_path (str): Ruta a la imagen de entrada
+        weights_path (str): Ruta a los pesos del modelo YOLOv8n
+
+    Returns:
+        tuple: (imagen con bounding boxes dibujados, número de personas detectadas)
+    """
+    # Leer la imagen
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"No se pudo leer la imagen desde {image_path}")
+
+    return _detect_people_in_frame(image, weights_path)
+
+@timed("process_image")
 def process_image(image_path: str):
     try:
         # Detectar personas en la imagen
         result_image, count = _detect_people_in_image(image_path)
-        
+
         print(f"PASSENGERS: Se detectaron {count} personas en la imagen.")
-        
+
         # Guardar la imagen con bounding boxes (opcional)
         output_path = image_path.rsplit('.', 1)[0] + '_detected.png'
         # cv2.imwrite(output_path, result_image)
         # print(f"PASSENGERS: Imagen con bounding boxes guardada como {output_path}")
 
         return count
-        
+
+    except Exception as e:
+        print(f"Error: {e}")
+
+@timed("process_frame")
+def process_frame(frame: np.ndarray):
+    """
+    Igual que process_image, pero para un frame que ya viene decodificado de una cámara o video.
+
+    Args:
+        frame (np.ndarray): Frame BGR de entrada
+
+    Returns:
+        int: Número de personas detectadas (None si hubo un error)
+    """
+    try:
+        _, count = _detect_people_in_frame(frame.copy())
+        print(f"PASSENGERS: Se detectaron {count} personas en el frame.")
+        return count
+
     except Exception as e:
         print(f"Error: {e}")
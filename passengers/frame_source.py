@@ -0,0 +1,236 @@
+"""
+Fuentes de frames para el conteo de pasajeros.
+
+Cada fuente decodifica frames en un hilo en segundo plano y los deja en un buffer
+circular acotado, de modo que el loop principal siempre lee el frame más reciente
+sin bloquearse esperando a la cámara.
+
+Fuentes soportadas:
+- Archivos de video locales (mp4, avi, ...)
+- Directorios de imágenes (se recorren en orden alfabético)
+- Streams tipo RTSP/HTTP (se reconecta si la conexión se cae)
+"""
+
+import os
+import threading
+from collections import deque
+from time import sleep, time
+
+import cv2
+
+from monitoring.instrumentation import count, set_queue_depth
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+STREAM_PREFIXES = ("rtsp://", "rtsps://", "http://", "https://", "udp://", "tcp://")
+
+class FrameSource:
+    """
+    Clase base: decodifica frames en un hilo y los guarda en un buffer circular.
+
+    Las subclases solo implementan `_frames()`, un generador que entrega frames BGR.
+    """
+
+    def __init__(self, buffer_size: int = 8):
+        self._buffer = deque(maxlen=buffer_size)  # Los frames más antiguos se descartan solos
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.finished = False
+
+    def _frames(self):
+        raise NotImplementedError
+
+    def _run(self):
+        try:
+            for frame in self._frames():
+                if self._stop_event.is_set():
+                    break
+                with self._lock:
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self.frames_dropped += 1
+                        count("frames_dropped")
+                    self._buffer.append(frame)
+                    self.frames_decoded += 1
+                    set_queue_depth("frames", len(self._buffer))
+                    self._new_frame.notify_all()
+        finally:
+            with self._lock:
+                self.finished = True
+                self._new_frame.notify_all()
+
+    def start(self):
+        """Inicia el hilo de decodificación (si no está corriendo)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self.finished = False
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el hilo de decodificación y espera a que termine."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def buffered(self) -> int:
+        """Número de frames esperando en el buffer."""
+        with self._lock:
+            return len(self._buffer)
+
+    def read_latest(self, timeout: float = None):
+        """
+        Devuelve el frame más reciente y vacía el buffer.
+
+        Args:
+            timeout (float): Segundos a esperar si el buffer está vacío (None = no esperar)
+
+        Returns:
+            np.ndarray | None: Frame BGR, o None si no hay frames disponibles
+        """
+        with self._lock:
+            if not self._buffer and timeout and not self.finished:
+                self._new_frame.wait(timeout)
+            if not self._buffer:
+                return None
+            frame = self._buffer[-1]
+            self._buffer.clear()
+            set_queue_depth("frames", 0)
+            return frame
+
+    def __iter__(self):
+        """Entrega todos los frames en orden (útil para procesar un video completo)."""
+        while True:
+            with self._lock:
+                while not self._buffer and not self.finished:
+                    self._new_frame.wait(0.5)
+                if not self._buffer:
+                    return
+                frame = self._buffer.popleft()
+            yield frame
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+class VideoFileSource(FrameSource):
+    """
+    Lee frames de un archivo de video local.
+
+    Args:
+        path (str): Ruta al archivo de video
+        realtime (bool): Si es True, respeta los FPS del video (simula una cámara en vivo)
+        loop (bool): Si es True, vuelve al inicio al terminar el video
+        buffer_size (int): Tamaño del buffer circular
+    """
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False, buffer_size: int = 8):
+        super().__init__(buffer_size)
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise ValueError(f"No se pudo abrir la fuente de video {self.path}")
+        return capture
+
+    def _frames(self):
+        while not self._stop_event.is_set():
+            capture = self._open()
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0
+            frame_period = 1.0 / fps if self.realtime and fps > 0 else 0
+            try:
+                next_time = time()
+                while not self._stop_event.is_set():
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    yield frame
+                    if frame_period:
+                        next_time += frame_period
+                        delay = next_time - time()
+                        if delay > 0:
+                            sleep(delay)
+            finally:
+                capture.release()
+            if not self.loop:
+                return
+
+class StreamSource(VideoFileSource):
+    """
+    Lee frames de un stream en vivo (RTSP, HTTP, ...). Si el stream se corta,
+    espera `reconnect_delay` segundos y vuelve a conectarse.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 2.0, buffer_size: int = 8):
+        # Un stream en vivo ya llega a su propio ritmo: no hace falta respetar FPS
+        super().__init__(url, realtime=False, loop=True, buffer_size=buffer_size)
+        self.reconnect_delay = reconnect_delay
+
+    def _frames(self):
+        while not self._stop_event.is_set():
+            try:
+                yield from super()._frames()
+            except ValueError as e:
+                print(f"Error: {e}")
+            self._stop_event.wait(self.reconnect_delay)
+
+class ImageDirectorySource(FrameSource):
+    """
+    Lee imágenes de un directorio en orden alfabético.
+
+    Args:
+        directory (str): Directorio con las imágenes
+        interval (float): Segundos entre imágenes (0 = lo más rápido posible)
+        loop (bool): Si es True, vuelve a empezar al terminar el directorio
+        buffer_size (int): Tamaño del buffer circular
+    """
+
+    def __init__(self, directory: str, interval: float = 0.0, loop: bool = False, buffer_size: int = 8):
+        super().__init__(buffer_size)
+        self.directory = directory
+        self.interval = interval
+        self.loop = loop
+
+    def _frames(self):
+        while not self._stop_event.is_set():
+            names = sorted(n for n in os.listdir(self.directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+            for name in names:
+                if self._stop_event.is_set():
+                    return
+                frame = cv2.imread(os.path.join(self.directory, name))
+                if frame is None:
+                    print(f"Error: No se pudo leer la imagen {name}")
+                    continue
+                yield frame
+                if self.interval:
+                    self._stop_event.wait(self.interval)
+            if not self.loop:
+                return
+
+def open_frame_source(uri: str, **kwargs) -> FrameSource:
+    """
+    Crea la fuente adecuada según el tipo de URI.
+
+    Args:
+        uri (str): Ruta a un video, a un directorio de imágenes o URL de un stream
+        **kwargs: Parámetros adicionales para la fuente
+
+    Returns:
+        FrameSource: Fuente de frames (sin iniciar)
+    """
+    if uri.lower().startswith(STREAM_PREFIXES):
+        return StreamSource(uri, **kwargs)
+    if os.path.isdir(uri):
+        return ImageDirectorySource(uri, **kwargs)
+    if os.path.exists(uri):
+        return VideoFileSource(uri, **kwargs)
+    raise FileNotFoundError(f"Fuente de frames no encontrada: {uri}")
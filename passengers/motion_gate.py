@@ -0,0 +1,112 @@
+"""
+Filtro de movimiento para el conteo de pasajeros.
+
+Compara cada frame con el último frame sobre el que se corrió YOLO usando una
+diferencia de imágenes muy barata (escala de grises, resolución reducida). Si la
+escena de la cabina no cambió, se reutiliza el conteo anterior y se evita la
+inferencia; así YOLO solo corre alrededor de paradas y aperturas de puertas.
+"""
+
+from time import time
+
+import cv2
+import numpy as np
+
+from monitoring.instrumentation import count as count_event
+from passengers.detection import process_frame
+
+class MotionGate:
+    """
+    Decide si un frame cambió lo suficiente respecto al frame de referencia.
+
+    Args:
+        threshold (float): Fracción de píxeles (0-1) que deben cambiar para considerar que hubo movimiento
+        pixel_delta (int): Diferencia mínima de intensidad (0-255) para que un píxel cuente como cambiado
+        size (tuple): Resolución (ancho, alto) a la que se reduce el frame antes de comparar
+    """
+
+    def __init__(self, threshold: float = 0.02, pixel_delta: int = 25, size: tuple = (160, 120)):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.size = size
+        self._reference = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        # Un desenfoque leve evita que el ruido del sensor cuente como movimiento
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_fraction(self, frame: np.ndarray) -> float:
+        """Fracción de píxeles que cambiaron respecto a la referencia (1.0 si no hay referencia)."""
+        if self._reference is None:
+            return 1.0
+        diff = cv2.absdiff(self._prepare(frame), self._reference)
+        return float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+
+    def has_changed(self, frame: np.ndarray) -> bool:
+        """True si el frame cambió lo suficiente como para volver a correr la inferencia."""
+        return self.changed_fraction(frame) >= self.threshold
+
+    def update_reference(self, frame: np.ndarray):
+        """Guarda el frame como nueva referencia (llamar después de correr la inferencia)."""
+        self._reference = self._prepare(frame)
+
+    def reset(self):
+        self._reference = None
+
+class GatedPassengerCounter:
+    """
+    Cuenta pasajeros solo cuando la escena cambia; si no, reutiliza el último conteo.
+
+    Args:
+        gate (MotionGate): Filtro de movimiento (por defecto uno con parámetros estándar)
+        max_age (float): Segundos máximos que se reutiliza un conteo aunque no haya movimiento
+        detector (callable): Función frame -> conteo (por defecto process_frame)
+    """
+
+    def __init__(self, gate: MotionGate = None, max_age: float = 300.0, detector=process_frame):
+        self.gate = gate or MotionGate()
+        self.max_age = max_age
+        self.detector = detector
+        self.last_count = None
+        self.last_inference_time = 0.0
+        self.inferences = 0
+        self.skipped = 0
+
+    def count(self, frame: np.ndarray):
+        """
+        Devuelve el número de pasajeros en el frame.
+
+        Args:
+            frame (np.ndarray): Frame BGR de la cámara de la cabina
+
+        Returns:
+            int: Número de personas (None si nunca se pudo contar)
+        """
+        stale = time() - self.last_inference_time > self.max_age
+        if self.last_count is not None and not stale and not self.gate.has_changed(frame):
+            self.skipped += 1
+            count_event("frames_skipped")
+            return self.last_count
+
+        count_event("frames_inferred")
+        count = self.detector(frame)
+        if count is not None:
+            self.last_count = count
+            self.last_inference_time = time()
+            self.gate.update_reference(frame)
+        self.inferences += 1
+        return self.last_count
+
+    def cached_count(self):
+        """
+        Último conteo, para los ticks sin frame nuevo (la cámara se cortó o la fuente terminó).
+
+        Returns:
+            int: Último conteo, o None si tiene más de max_age segundos (ya no es confiable)
+        """
+        if self.last_count is not None and time() - self.last_inference_time > self.max_age:
+            count_event("passenger_count_stale")
+            return None
+        return self.last_count
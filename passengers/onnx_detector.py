@@ -0,0 +1,164 @@
+"""
+Detector de personas con YOLOv8n exportado a ONNX y ejecutado con onnxruntime en CPU.
+
+Los equipos en cocheras y buses no tienen GPU, así que la latencia por frame en CPU
+define cuántas cámaras puede atender un mismo equipo. Este backend evita cargar
+PyTorch/ultralytics en tiempo de ejecución, permite reducir la resolución de entrada
+y fijar el número de hilos, y hace el post-procesamiento (solo clase 'person' + NMS)
+directamente con NumPy.
+
+Para generar el modelo:
+    from passengers.onnx_detector import export_onnx
+    export_onnx("weight/yolov8n.pt", imgsz=416, int8=True)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+PERSON_CLASS_ID = 0  # Clase 0 corresponde a 'person' en COCO
+LETTERBOX_COLOR = (114, 114, 114)  # Mismo relleno que usa ultralytics
+
+def export_onnx(weights_path='weight/yolov8n.pt', imgsz=640, int8=False):
+    """
+    Exporta los pesos de YOLOv8n a ONNX y, opcionalmente, los cuantiza a INT8.
+
+    Solo se necesita ultralytics para exportar; la inferencia posterior solo usa onnxruntime.
+
+    Args:
+        weights_path (str): Ruta a los pesos .pt de YOLOv8n
+        imgsz (int): Resolución de entrada con la que se exporta el modelo
+        int8 (bool): Si es True, genera además un modelo cuantizado (pesos INT8)
+
+    Returns:
+        str: Ruta al modelo ONNX generado (el cuantizado si int8=True)
+    """
+    from ultralytics import YOLO
+
+    onnx_path = YOLO(weights_path).export(format="onnx", imgsz=imgsz, simplify=True)
+    if not int8:
+        return onnx_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = onnx_path.rsplit('.', 1)[0] + '_int8.onnx'
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+def letterbox(image, imgsz):
+    """
+    Redimensiona la imagen manteniendo la proporción y rellena hasta imgsz x imgsz.
+
+    Returns:
+        tuple: (imagen redimensionada, escala, (relleno_x, relleno_y))
+    """
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (imgsz - new_w) // 2, (imgsz - new_h) // 2
+
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    padded = cv2.copyMakeBorder(resized, pad_y, imgsz - new_h - pad_y, pad_x, imgsz - new_w - pad_x,
+                                cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return padded, scale, (pad_x, pad_y)
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Non-Maximum Suppression con NumPy.
+
+    Args:
+        boxes (np.ndarray): Cajas (N, 4) en formato x1, y1, x2, y2
+        scores (np.ndarray): Confianza (N,) de cada caja
+        iou_threshold (float): IoU a partir del cual una caja se descarta
+
+    Returns:
+        np.ndarray: Índices de las cajas que se conservan, ordenados por confianza
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        # Intersección de la mejor caja con el resto
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+class OnnxPersonDetector:
+    """
+    Detector de personas con onnxruntime en CPU.
+
+    Args:
+        model_path (str): Ruta al modelo YOLOv8n en ONNX (float32 o INT8)
+        imgsz (int): Resolución de entrada; debe coincidir con la usada al exportar
+        threads (int): Hilos intra-op de onnxruntime (None = los que decida onnxruntime)
+        conf_threshold (float): Confianza mínima para aceptar una detección
+        iou_threshold (float): IoU para el NMS
+    """
+
+    def __init__(self, model_path='weight/yolov8n.onnx', imgsz=640, threads=None, conf_threshold=0.25, iou_threshold=0.45):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Modelo ONNX no encontrado en {model_path}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def _preprocess(self, image):
+        padded, scale, pad = letterbox(image, self.imgsz)
+        # BGR -> RGB, HWC -> CHW, 0-255 -> 0-1
+        blob = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+        blob = np.ascontiguousarray(blob, dtype=np.float32)[None] / 255.0
+        return blob, scale, pad
+
+    def detect(self, image):
+        """
+        Detecta personas en un frame BGR.
+
+        Args:
+            image (np.ndarray): Frame BGR de entrada
+
+        Returns:
+            tuple: (cajas (N, 4) x1, y1, x2, y2 en píxeles de la imagen original, confianzas (N,))
+        """
+        blob, scale, (pad_x, pad_y) = self._preprocess(image)
+        # Salida de YOLOv8: (1, 4 + clases, anclas) -> cx, cy, w, h y una fila de puntaje por clase
+        output = self.session.run(None, {self.input_name: blob})[0][0]
+
+        scores = output[4 + PERSON_CLASS_ID]
+        candidates = scores > self.conf_threshold
+        if not np.any(candidates):
+            return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32)
+
+        cx, cy, w, h = output[:4, candidates]
+        scores = scores[candidates]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        # Deshacer el letterbox para volver a coordenadas de la imagen original
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / scale
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / scale
+        h_img, w_img = image.shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w_img)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h_img)
+
+        keep = nms(boxes, scores, self.iou_threshold)
+        return boxes[keep], scores[keep]
@@ -1,7 +1,10 @@
 import requests
 from requests.auth import HTTPBasicAuth
+from monitoring.instrumentation import timed, count
 
-def obtener_coordenadas(BASE_URL, USUARIO, PASSWORD):
+@timed("traccar_fetch")
+def obtener_posiciones(BASE_URL, USUARIO, PASSWORD):
+    """Devuelve la lista completa de posiciones de /api/positions (None si hubo un error)."""
     # Endpoint para obtener las posiciones (generalmente devuelve las últimas)
     url = f"{BASE_URL}/api/positions"
     
@@ -15,20 +18,28 @@ def obtener_coordenadas(BASE_URL, USUARIO, PASSWORD):
         
         # Si la respuesta es exitosa (Código 200)
         if response.status_code == 200:
-            datos = response.json()
-            
-            if not datos:
-                print("Not found any device.")
-                return
-            
-            for position in datos:
-                return position
-                
+            return response.json()
+
         else:
+            count("traccar_fetch_failed")
             print(f"Error connecting: {response.status_code}")
             print(response.text)
             return None
 
     except requests.exceptions.ConnectionError:
+        count("traccar_fetch_failed")
         print("Error: Could not connect to the server. Make sure Traccar is running.")
-        return None
\ No newline at end of file
+        return None
+
+def obtener_coordenadas(BASE_URL, USUARIO, PASSWORD):
+    datos = obtener_posiciones(BASE_URL, USUARIO, PASSWORD)
+    if datos is None:
+        return None
+
+    if not datos:
+        count("traccar_no_devices")  # Traccar answered, but no device is reporting
+        print("Not found any device.")
+        return
+
+    for position in datos:
+        return position
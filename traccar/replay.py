@@ -0,0 +1,265 @@
+"""
+Record-and-replay of Traccar positions and GTFS-RT snapshots.
+
+The recorder appends every /api/positions response (and, optionally, GTFS-RT
+VehiclePositions snapshots) to an NDJSON log, one record per line:
+
+    {"t": 1735579200.123, "kind": "positions", "data": [...]}
+    {"t": 1735579201.456, "kind": "gtfs_rt", "data": {...}}
+
+If the path ends in ".gz" the log is gzip-compressed; appending to an existing log
+adds a new gzip member, which gzip readers handle transparently. A compressed log
+that was not closed cleanly (e.g. the recorder was killed) ends in a truncated
+member: it is read up to its last complete record, and anything appended after it
+is not readable.
+
+The replayer reads the log back and feeds it to the pipeline in place of
+obtener_coordenadas, at 1x, Nx or as fast as possible (speed=0), so a full day can
+be reproduced without Traccar, ngrok or a phone.
+
+Usage:
+    python -m traccar.replay record --output logs/day.ndjson.gz --interval 5
+    python -m traccar.replay info logs/day.ndjson.gz
+    python main.py --mode matching --replay logs/day.ndjson.gz --speed 0 --iterations 0
+    python main.py --mode render --replay logs/day.ndjson.gz --speed 10
+"""
+
+import argparse
+import gzip
+import json
+import zlib
+from time import sleep, time
+
+KIND_POSITIONS = "positions"
+KIND_GTFS_RT = "gtfs_rt"
+
+def _open_log(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def read_records(path):
+    """
+    Read the records of a log in order.
+
+    A line that is not valid JSON is skipped. A compressed log that ends in a truncated
+    gzip member stops at the last complete record before it.
+
+    Yields:
+        dict: Records with keys "t" (unix time), "kind" and "data"
+    """
+    with _open_log(path, "r") as f:
+        line_number = 0
+        try:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupted record at line {line_number} of {path}")
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            # The recorder was killed mid-write: the rest of the compressed stream cannot be decoded
+            print(f"Warning: {path} is truncated after line {line_number}, ignoring the rest of the log")
+
+class PositionRecorder:
+    """
+    Appends Traccar responses and GTFS-RT snapshots to a log.
+
+    Args:
+        path (str): Log path (".gz" for gzip compression)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = _open_log(path, "a")
+        self.records = 0
+
+    def write(self, kind, data, timestamp=None):
+        record = {"t": timestamp if timestamp is not None else time(), "kind": kind, "data": data}
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.records += 1
+
+    def obtener_coordenadas(self, BASE_URL, USUARIO, PASSWORD):
+        """
+        Same contract as traccar.connection.obtener_coordenadas, but records the full
+        /api/positions response before returning the first position.
+        """
+        from monitoring.instrumentation import count
+        from traccar.connection import obtener_posiciones
+
+        datos = obtener_posiciones(BASE_URL, USUARIO, PASSWORD)
+        if datos is None:
+            return None
+        self.write(KIND_POSITIONS, datos)
+
+        if not datos:
+            count("traccar_no_devices")
+            print("Not found any device.")
+            return
+        return datos[0]
+
+    def record_gtfs_rt(self, source):
+        """
+        Record a GTFS-RT VehiclePositions snapshot.
+
+        Args:
+            source (str | dict): Snapshot already parsed, path to a JSON file or URL returning JSON
+        """
+        if isinstance(source, dict):
+            snapshot = source
+        elif source.startswith(("http://", "https://")):
+            import requests
+
+            snapshot = requests.get(source, headers={"Accept": "application/json"}).json()
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        self.write(KIND_GTFS_RT, snapshot)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class PositionReplayer:
+    """
+    Replays a recorded log in place of obtener_coordenadas.
+
+    Args:
+        path (str): Log path
+        speed (float): 1 = real time, N = N times faster, 0 = as fast as possible
+        loop (bool): If True, start again at the end of the log
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+        self.ticks = 0
+        self._records = read_records(path)
+        self._anchor = None  # (recorded time, wall time) of the first replayed record
+
+    def _wait_until(self, recorded_time):
+        if not self.speed:
+            return
+        if self._anchor is None:
+            self._anchor = (recorded_time, time())
+            return
+        first_recorded, first_wall = self._anchor
+        delay = first_wall + (recorded_time - first_recorded) / self.speed - time()
+        if delay > 0:
+            sleep(delay)
+
+    def _next_record(self, kind):
+        while True:
+            record = next(self._records, None)
+            if record is None:
+                if not self.loop or not self.ticks:  # Looping a log without records of this kind would never return
+                    self.finished = True
+                    return None
+                self._records = read_records(self.path)
+                self._anchor = None
+                continue
+
+            if record["kind"] != kind:
+                continue
+            self._wait_until(record["t"])
+            self.ticks += 1
+            return record["data"]
+
+    def next_positions(self):
+        """
+        Return the next recorded /api/positions response, waiting as needed to respect `speed`.
+
+        Returns:
+            list | None: Positions, or None when the log is over
+        """
+        return self._next_record(KIND_POSITIONS)
+
+    def next_gtfs_rt(self):
+        """
+        Return the next recorded GTFS-RT VehiclePositions snapshot, waiting as needed to respect `speed`.
+
+        Returns:
+            dict | None: Snapshot, or None when the log is over
+        """
+        return self._next_record(KIND_GTFS_RT)
+
+    def obtener_coordenadas(self, *args):
+        """Same contract as traccar.connection.obtener_coordenadas (credentials are ignored)."""
+        datos = self.next_positions()
+        if not datos:
+            return None
+        return datos[0]
+
+def record_session(BASE_URL, USUARIO, PASSWORD, output, interval=5.0, iterations=0, gtfs_rt=None):
+    """
+    Poll Traccar (and optionally a GTFS-RT feed) every `interval` seconds and record the responses.
+
+    Args:
+        output (str): Log path (".gz" for gzip compression)
+        interval (float): Seconds between polls
+        iterations (int): Number of polls (0 = until Ctrl+C)
+        gtfs_rt (str): Optional path or URL of a GTFS-RT VehiclePositions JSON feed
+    """
+    with PositionRecorder(output) as recorder:
+        polls = 0
+        try:
+            while not iterations or polls < iterations:
+                polls += 1
+                recorder.obtener_coordenadas(BASE_URL, USUARIO, PASSWORD)
+                if gtfs_rt:
+                    recorder.record_gtfs_rt(gtfs_rt)
+                sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        print(f"Recorded {recorder.records} records to {output}")
+
+def log_info(path):
+    """Print a summary of a log: number of records by kind and recorded time span."""
+    counts = {}
+    first = last = None
+    for record in read_records(path):
+        counts[record["kind"]] = counts.get(record["kind"], 0) + 1
+        first = record["t"] if first is None else first
+        last = record["t"]
+    print(f"Log: {path}")
+    for kind, value in sorted(counts.items()):
+        print(f"  {kind}: {value} records")
+    if first is not None:
+        print(f"  Recorded span: {last - first:.1f} seconds")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and inspect Traccar/GTFS-RT logs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record Traccar positions")
+    record_parser.add_argument("--output", required=True, help="Log path (.gz for compression)")
+    record_parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls")
+    record_parser.add_argument("--iterations", type=int, default=0, help="Number of polls (0 = until Ctrl+C)")
+    record_parser.add_argument("--gtfs-rt", help="Path or URL of a GTFS-RT VehiclePositions JSON feed")
+    record_parser.add_argument("--credentials", default="credentials/credentials_traccar.json")
+
+    info_parser = subparsers.add_parser("info", help="Summarize a log")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "info":
+        log_info(args.path)
+        return
+
+    with open(args.credentials, 'r') as cred_file:
+        cred_data = json.load(cred_file)
+    record_session(cred_data["BASE_URL"], cred_data["USUARIO"], cred_data["PASSWORD"],
+                   args.output, args.interval, args.iterations, args.gtfs_rt)
+
+if __name__ == "__main__":
+    main()
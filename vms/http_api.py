@@ -0,0 +1,159 @@
+"""
+Servidor HTTP local que entrega los frames de los paneles y las llegadas por paradero.
+
+Todas las respuestas salen de una caché en memoria con los bytes ya codificados: el
+loop principal publica cada panel una vez por iteración y los controladores de panel
+o vistas web solo leen. Cada entrada tiene un ETag (hash del contenido), así que un
+cliente que envía If-None-Match recibe 304 sin cuerpo mientras el frame no cambie.
+
+Rutas:
+    GET /signs/<sign_id>.png              Imagen simulada del panel (PNG)
+    GET /signs/<sign_id>.raw              Frame crudo RGB, un píxel por LED (MATRIX_W x MATRIX_H x 3 bytes)
+    GET /stops/<stop_id>/arrivals.json    Llegadas estimadas al paradero
+    GET /index.json                       Lista de rutas publicadas
+"""
+
+import hashlib
+import io
+import json
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INDEX_PATH = "/index.json"
+
+CacheEntry = namedtuple("CacheEntry", ["body", "etag", "content_type", "headers"])
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+class SignCache:
+    """
+    Caché en memoria de respuestas ya codificadas, indexadas por ruta HTTP.
+
+    Las entradas son inmutables: publicar reemplaza la entrada completa, así que los
+    lectores nunca ven un frame a medio escribir.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._publish_index()
+
+    def _publish_index(self):
+        # El índice solo cambia cuando aparece una ruta nueva, así que su ETag es estable
+        body = json.dumps({"paths": sorted(path for path in self._entries if path != INDEX_PATH)}).encode("utf-8")
+        self._entries[INDEX_PATH] = CacheEntry(body, _etag(body), "application/json", {})
+
+    def _publish(self, path, body, content_type, headers=None):
+        entry = self._entries.get(path)
+        if entry is not None and entry.body == body:
+            return entry  # Sin cambios: se conserva el ETag
+        entry = CacheEntry(body, _etag(body), content_type, headers or {})
+        with self._lock:
+            new_path = path not in self._entries
+            self._entries[path] = entry
+            if new_path:
+                self._publish_index()
+        return entry
+
+    def get(self, path):
+        return self._entries.get(path)
+
+    def paths(self):
+        with self._lock:
+            return sorted(path for path in self._entries if path != INDEX_PATH)
+
+    def publish_sign(self, sign_id, image, led_frame=None):
+        """
+        Publica la imagen de un panel (y opcionalmente su frame crudo).
+
+        Args:
+            sign_id (str): Identificador del panel
+            image (Image): Imagen generada por build_led_image
+            led_frame (Image): Frame generado por build_led_matrix (un píxel por LED)
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        self._publish(f"/signs/{sign_id}.png", buffer.getvalue(), "image/png")
+
+        if led_frame is not None:
+            width, height = led_frame.size
+            self._publish(f"/signs/{sign_id}.raw", led_frame.tobytes(), "application/octet-stream",
+                          {"X-Frame-Width": str(width), "X-Frame-Height": str(height), "X-Frame-Format": "RGB24"})
+
+    def publish_arrivals(self, stop_id, arrivals):
+        """
+        Publica las llegadas estimadas a un paradero.
+
+        Args:
+            stop_id (str): Identificador del paradero
+            arrivals (list): Lista de diccionarios (route_id, bus_id, eta_seconds, capacity, ...)
+        """
+        body = json.dumps({"stop_id": stop_id, "arrivals": arrivals}, ensure_ascii=False).encode("utf-8")
+        self._publish(f"/stops/{stop_id}/arrivals.json", body, "application/json; charset=utf-8")
+
+def _matches_etag(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class SignRequestHandler(BaseHTTPRequestHandler):
+    cache = None  # Se asigna al crear el servidor
+
+    def _respond(self, send_body):
+        entry = self.cache.get(self.path.split("?", 1)[0])
+        if entry is None:
+            self.send_error(404)
+            return
+
+        if _matches_etag(self.headers.get("If-None-Match"), entry.etag):
+            self.send_response(304)
+            self.send_header("ETag", entry.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        self.send_header("Content-Length", str(len(entry.body)))
+        self.send_header("ETag", entry.etag)
+        self.send_header("Cache-Control", "no-cache")  # Siempre revalidar: el 304 es casi gratis
+        for name, value in entry.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(entry.body)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        pass  # Miles de consultas por minuto llenarían la consola
+
+def start_sign_server(cache: SignCache, port=8080, host="127.0.0.1"):
+    """
+    Inicia el servidor HTTP de paneles en un hilo en segundo plano.
+
+    Args:
+        cache (SignCache): Caché de donde salen todas las respuestas
+        port (int): Puerto
+        host (str): Interfaz (localhost por defecto; "0.0.0.0" para controladores en la red)
+
+    Returns:
+        ThreadingHTTPServer: Servidor en ejecución (llamar shutdown() para detenerlo)
+    """
+    handler = type("BoundSignRequestHandler", (SignRequestHandler,), {"cache": cache})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="sign-server", daemon=True)
+    thread.start()
+    print(f"Signs available at http://{host}:{server.server_port}/index.json")
+    return server
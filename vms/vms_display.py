@@ -7,6 +7,7 @@ la apariencia de los displays utilizados en estaciones de buses o metro.
 """
 
 from PIL import Image, ImageDraw, ImageFont
+from monitoring.instrumentation import timed
 
 # --- Configuración del panel P8 ---
 # Los paneles P8 tienen una matriz de LEDs más densa que los P10
@@ -88,6 +89,7 @@ def render_text_mask(text: str, font_px=12, margin=3, line_spacing=2, color=(255
     mask = mask1.convert("L")
     return mask, color
 
+@timed("build_led_image")
 def build_led_image(masks_with_colors):
     """
     Construye la imagen de LEDs encendidos/apagados a partir de múltiples máscaras con colores.
@@ -136,6 +138,23 @@ def build_led_image(masks_with_colors):
             draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=final_color)
     return out
 
+def build_led_matrix(masks_with_colors):
+    """
+    Construye el frame "crudo" del panel: una imagen de MATRIX_W x MATRIX_H donde cada píxel
+    es el color de un LED. Es lo que necesita un controlador de panel físico (sin círculos ni espacios).
+
+    Args:
+        masks_with_colors (list): Lista de tuplas (mask: Image, color: tuple), igual que en build_led_image
+
+    Returns:
+        Image: Imagen RGB de MATRIX_W x MATRIX_H (un píxel por LED)
+    """
+    frame = Image.new("RGB", (MATRIX_W, MATRIX_H), LED_OFF_COLOR)
+    # Se pegan en orden inverso para que el primer texto tenga prioridad, como en build_led_image
+    for mask, color in reversed(masks_with_colors):
+        frame.paste(color, (0, 0), mask.point(lambda val: 255 if val > 0 else 0))
+    return frame
+
 def parse_colored_text(text: str, font_px=12, margin=3, line_spacing=2):
     """
     Procesa texto con marcadores de color y devuelve una lista de máscaras con sus colores.